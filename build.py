@@ -2,16 +2,49 @@
 """Build V8 as a static library."""
 
 import argparse
+import ast
+import concurrent.futures
+import hashlib
 import os
 import subprocess
 import sys
 import platform
+import re
 import shutil
+import tarfile
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Oldest system clang accepted by --system-clang
+MIN_SYSTEM_CLANG_VERSION = 17
+
+# Host platform, queried once
+_SYSTEM = platform.system()
+_MACHINE = platform.machine().lower()
+_IS_WINDOWS = _SYSTEM == "Windows"
+_CLANG_EXE = "clang.exe" if _IS_WINDOWS else "clang"
 
 # On Windows, use locally installed Visual Studio instead of downloading
-if platform.system() == "Windows":
+if _IS_WINDOWS:
     os.environ["DEPOT_TOOLS_WIN_TOOLCHAIN"] = "0"
 
+# Directory listings by path, so repeated existence checks don't each stat
+_dir_entries = {}
+
+
+def positive_int(value):
+    """Parse a positive integer command line argument."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer: {value}")
+    return number
+
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Build V8 as a static library")
@@ -19,29 +52,65 @@ def parse_args():
                         help="Build in this directory instead of the script directory")
     parser.add_argument("--debug", action="store_true",
                         help="Build debug version (not supported on Windows)")
+    parser.add_argument("--release-official", action="store_true",
+                        help="Build an official release with ThinLTO and Chromium's libc++. "
+                             "Consumers must also be built against Chromium's libc++ and "
+                             "linked with an LLVM linker at least as new as Chromium's "
+                             "clang; not usable with --install or this repo's CMake "
+                             "integration")
     parser.add_argument("--install", dest="install_dir", metavar="DIR",
                         help="Install V8 libraries and headers to this directory")
+    parser.add_argument("--link-mode", choices=["copy", "hardlink", "symlink"],
+                        help="How to install headers (default: hardlink if on the same "
+                             "filesystem as the V8 checkout, otherwise copy)")
     parser.add_argument("--target-cpu", choices=["x64", "arm64"],
                         help="Target CPU architecture (for cross-compilation)")
     parser.add_argument("--args-gn", dest="args_gn", metavar="FILE", required=True,
                         help="Path to args.gn file with GN build arguments")
+    parser.add_argument("-j", "--jobs", type=positive_int,
+                        help="Number of parallel ninja jobs (default: based on CPU count and memory)")
+    parser.add_argument("--system-clang", action="store_true",
+                        help="Use the clang found on PATH instead of downloading Chromium's clang")
+    parser.add_argument("--build-cache", action="store_true",
+                        help="Reuse built libraries from a local cache keyed on the V8 "
+                             "checkout state and GN args (stored in ~/.cache/v8-build)")
     return parser.parse_args()
 
 
 def run(cmd, cwd=None, env=None):
     """Run a command and exit on failure."""
     print(f"==> Running: {' '.join(cmd)}")
-    merged_env = os.environ.copy()
-    if env:
-        merged_env.update(env)
-    result = subprocess.run(cmd, cwd=cwd, env=merged_env)
-    if result.returncode != 0:
-        sys.exit(result.returncode)
+    # Only build a new environment when overriding variables; otherwise the
+    # child inherits ours as-is
+    merged_env = {**os.environ, **env} if env else None
+    # Flush so our output isn't reordered after the child's when piped
+    sys.stdout.flush()
+    proc = subprocess.Popen(cmd, cwd=cwd, env=merged_env)
+    returncode = proc.wait()
+    if returncode != 0:
+        sys.exit(returncode)
+
+
+def get_dir_entries(path):
+    """Get a directory's entries by name, scanning it only once."""
+    if path not in _dir_entries:
+        try:
+            with os.scandir(path) as it:
+                _dir_entries[path] = {entry.name: entry for entry in it}
+        except OSError:
+            _dir_entries[path] = {}
+    return _dir_entries[path]
+
+
+def is_cached_file(path):
+    """Check whether path is a file, using the cached directory listing."""
+    entry = get_dir_entries(os.path.dirname(path)).get(os.path.basename(path))
+    return entry is not None and entry.is_file()
 
 
 def get_target_os():
     """Get the target OS name for V8."""
-    system = platform.system()
+    system = _SYSTEM
     if system == "Linux":
         return "linux"
     elif system == "Darwin":
@@ -55,7 +124,7 @@ def get_target_os():
 
 def get_target_cpu():
     """Get the target CPU architecture for V8."""
-    machine = platform.machine().lower()
+    machine = _MACHINE
     if machine in ("x86_64", "amd64"):
         return "x64"
     elif machine in ("aarch64", "arm64"):
@@ -65,98 +134,438 @@ def get_target_cpu():
         sys.exit(1)
 
 
+def get_total_memory():
+    """Get the total physical memory in bytes, or None if unknown."""
+    if _IS_WINDOWS:
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong),
+                ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong),
+                ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong),
+                ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong),
+                ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+            ]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if not ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return None
+        return status.ullTotalPhys
+
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError):
+        return None
+
+
+def compute_jobs():
+    """Choose a ninja job count from the CPU count and available memory.
+
+    Compiling and linking V8 needs roughly 2 GB per job, so hosts with many
+    cores but little memory are limited by memory instead of CPU count.
+    """
+    jobs = (os.cpu_count() or 1) + 2
+    mem_bytes = get_total_memory()
+    if mem_bytes:
+        mem_gb = mem_bytes / (1024 ** 3)
+        jobs = min(jobs, int(mem_gb / 2))
+    return max(jobs, 1)
+
+
 def install_sysroot(v8_dir, arch):
     """Install sysroot for cross-compilation."""
     # Map V8 arch names to sysroot arch names
     arch_map = {"arm64": "arm64", "x64": "amd64"}
     sysroot_arch = arch_map.get(arch, arch)
 
-    sysroot_path = os.path.join(v8_dir, "build", "linux", f"debian_bullseye_{sysroot_arch}-sysroot")
+    linux_dir = os.path.join(v8_dir, "build", "linux")
+    sysroot_name = f"debian_bullseye_{sysroot_arch}-sysroot"
+    sysroot_path = os.path.join(linux_dir, sysroot_name)
 
-    if os.path.isdir(sysroot_path):
+    entry = get_dir_entries(linux_dir).get(sysroot_name)
+    if entry is not None and entry.is_dir():
         print(f"==> Sysroot already exists: {sysroot_path}")
         return
 
     print(f"==> Installing sysroot for {sysroot_arch}...")
-    script_path = os.path.join(v8_dir, "build", "linux", "sysroot_scripts", "install-sysroot.py")
+    script_path = os.path.join(linux_dir, "sysroot_scripts", "install-sysroot.py")
     run([sys.executable, script_path, f"--arch={sysroot_arch}"])
+    _dir_entries.pop(linux_dir, None)
+
+
+def get_clang_stamp(v8_dir):
+    """Hash the inputs that determine which clang revision gets downloaded."""
+    digest = hashlib.sha256()
+    script_path = os.path.join(v8_dir, "tools", "clang", "scripts", "update.py")
+    with open(script_path, "rb") as f:
+        digest.update(f.read())
+
+    # Also include the pinned tools/clang revision from DEPS
+    deps_path = os.path.join(v8_dir, "DEPS")
+    if os.path.isfile(deps_path):
+        with open(deps_path, "rb") as f:
+            for line in f:
+                if b"tools/clang" in line:
+                    digest.update(line)
+
+    return digest.hexdigest()
+
+
+def get_clang_base_path(root_dir):
+    """Get the directory Chromium's clang is downloaded to."""
+    return os.path.join(root_dir, "third_party", "llvm-build")
 
 
 def download_clang(v8_dir, root_dir):
     """Download Chromium's clang toolchain."""
-    clang_base_path = os.path.join(root_dir, "third_party", "llvm-build")
-
-    # Check if clang is already downloaded
-    clang_bin = os.path.join(clang_base_path, "bin", "clang")
-    if os.path.isfile(clang_bin):
-        print(f"==> Clang already exists: {clang_base_path}")
-        return clang_base_path
+    clang_base_path = get_clang_base_path(root_dir)
+    stamp_path = os.path.join(clang_base_path, ".clang-revision-stamp")
+    stamp = get_clang_stamp(v8_dir)
+
+    # Check if the expected clang revision is already downloaded
+    clang_bin = os.path.join(clang_base_path, "bin", _CLANG_EXE)
+    if is_cached_file(clang_bin):
+        try:
+            with open(stamp_path, "r") as f:
+                current_stamp = f.read().strip()
+        except FileNotFoundError:
+            current_stamp = None
+        if current_stamp == stamp:
+            print(f"==> Clang already exists: {clang_base_path}")
+            return clang_base_path
 
     print("==> Downloading Chromium's clang...")
     script_path = os.path.join(v8_dir, "tools", "clang", "scripts", "update.py")
     # Run from v8 directory (script expects to be run from there)
     run([sys.executable, script_path, "--output-dir", clang_base_path], cwd=v8_dir)
+    _dir_entries.pop(os.path.dirname(clang_bin), None)
+
+    with open(stamp_path, "w") as f:
+        f.write(stamp + "\n")
 
     return clang_base_path
 
 
-def convert_thin_archive(archive_path):
+def find_system_clang():
+    """Find the system clang toolchain.
+
+    Returns the toolchain base path (the parent of its bin/ directory) and the
+    clang major version.
+    """
+    clang = shutil.which("clang")
+    if not clang:
+        print("Error: clang not found on PATH")
+        sys.exit(1)
+
+    result = subprocess.run([clang, "--version"], capture_output=True, text=True)
+    # Apple clang's version numbers don't follow LLVM's, and it ships without
+    # the LLVM tools Chromium's toolchain needs
+    if "Apple clang" in result.stdout:
+        print(f"Error: {clang} is Apple clang, which is not supported; "
+              "install LLVM's clang instead")
+        sys.exit(1)
+    match = re.search(r"clang version (\d+)", result.stdout)
+    if result.returncode != 0 or not match:
+        print(f"Error: Could not determine version of {clang}")
+        sys.exit(1)
+
+    version = int(match.group(1))
+    if version < MIN_SYSTEM_CLANG_VERSION:
+        print(f"Error: clang {version} is too old, "
+              f"need at least clang {MIN_SYSTEM_CLANG_VERSION}")
+        sys.exit(1)
+
+    # Resolve symlinks like /usr/bin/clang -> /usr/lib/llvm-18/bin/clang
+    clang_base_path = os.path.dirname(os.path.dirname(os.path.realpath(clang)))
+
+    # Chromium's toolchain runs these from clang_base_path/bin, not from PATH
+    if _IS_WINDOWS:
+        tools = ["clang-cl.exe", "lld-link.exe"]
+    elif _SYSTEM == "Darwin":
+        tools = ["clang", "clang++", "llvm-ar", "ld64.lld"]
+    else:
+        tools = ["clang", "clang++", "llvm-ar", "ld.lld"]
+    bin_dir = os.path.join(clang_base_path, "bin")
+    missing = [tool for tool in tools
+               if not is_cached_file(os.path.join(bin_dir, tool))]
+    if missing:
+        print(f"Error: {bin_dir} is missing {', '.join(missing)} "
+              "(install LLVM's binutils and lld alongside clang)")
+        sys.exit(1)
+    print(f"==> Found system clang {version}: {clang_base_path}")
+    return clang_base_path, version
+
+
+def is_thin_archive(archive_path):
+    """Check whether an archive is a thin archive."""
+    magic = b"!<thin>\n"
+    with open(archive_path, "rb") as f:
+        return f.read(len(magic)) == magic
+
+
+def convert_thin_archive(archive_path, ar_cmd="ar"):
     """Convert a thin archive to a regular archive.
 
     V8 builds thin archives on Linux which only contain references to object
     files. This converts them to regular archives that are self-contained.
     """
-    print(f"==> Converting thin archive: {archive_path}")
-    # List members of the thin archive
-    result = subprocess.run(["ar", "-t", archive_path],
-                            capture_output=True, text=True, check=True)
-    members = result.stdout.strip().split('\n')
+    # Nothing to do if a previous install already converted it
+    if not is_thin_archive(archive_path):
+        print(f"==> Already a regular archive: {archive_path}")
+        return
 
-    # Create a new archive with the actual object files
+    print(f"==> Converting thin archive: {archive_path}")
     new_archive = archive_path + ".new"
-    cmd = ["ar", "rvs", new_archive] + members
-    subprocess.run(cmd, cwd=os.path.dirname(archive_path), check=True)
+    if os.path.exists(new_archive):
+        os.remove(new_archive)
+
+    def append_members(members):
+        cmd = [ar_cmd, "qc", new_archive] + members
+        subprocess.run(cmd, cwd=os.path.dirname(archive_path), check=True)
+
+    # Create a new archive with the actual object files. Members of the thin
+    # archive are streamed and appended in chunks, which keeps memory use flat
+    # and stays below the command line length limit.
+    chunk_size = 1000
+    members = []
+    with subprocess.Popen([ar_cmd, "-t", archive_path],
+                          stdout=subprocess.PIPE, text=True) as proc:
+        for line in proc.stdout:
+            member = line.rstrip("\n")
+            if member:
+                members.append(member)
+            if len(members) == chunk_size:
+                append_members(members)
+                members = []
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, proc.args)
+    if members:
+        append_members(members)
 
     # Replace the original
     shutil.move(new_archive, archive_path)
 
 
-def install_v8(v8_dir, out_path, install_dir, target_os):
+def get_lib_names(target_os):
+    """Get the names of the built libraries that get installed.
+
+    The first is the monolith library. Any others are thin archives that
+    need converting before they are installed.
+    """
+    if target_os == "win":
+        return ["v8_monolith.lib"]
+    elif target_os == "linux":
+        return ["libv8_monolith.a", "libv8_libbase.a", "libv8_libplatform.a"]
+    else:
+        return ["libv8_monolith.a"]
+
+
+def get_checkouts(root_dir, v8_dir):
+    """List the git checkouts the build reads: V8 and its gclient dependencies."""
+    checkouts = [v8_dir]
+    entries_path = os.path.join(root_dir, ".gclient_entries")
+    if os.path.isfile(entries_path):
+        # gclient records the synced dependencies as `entries = {path: url}`
+        with open(entries_path, "r") as f:
+            entries = ast.literal_eval(f.read().split("=", 1)[1].strip())
+        for path in sorted(entries):
+            checkout = os.path.join(root_dir, path)
+            if checkout != v8_dir and os.path.isdir(os.path.join(checkout, ".git")):
+                checkouts.append(checkout)
+    return checkouts
+
+
+def get_tree_state(checkouts):
+    """Hash the revision and uncommitted changes of each checkout.
+
+    Returns None if a checkout has untracked files, whose contents git can't
+    diff.
+    """
+    digest = hashlib.sha256()
+    for checkout in checkouts:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], cwd=checkout,
+                                capture_output=True, text=True, check=True)
+        digest.update(result.stdout.encode())
+
+        result = subprocess.run(["git", "status", "--porcelain"], cwd=checkout,
+                                capture_output=True, text=True, check=True)
+        changes = result.stdout.splitlines()
+        # The compile_commands.json link at the V8 root is ours
+        untracked = [line for line in changes
+                     if line.startswith("??") and line != "?? compile_commands.json"]
+        if untracked:
+            print(f"Warning: Untracked files in {checkout}: {untracked[0][3:]}")
+            return None
+
+        # Local changes, e.g. the crel patch in build/, are part of the key
+        if any(not line.startswith("??") for line in changes):
+            result = subprocess.run(["git", "diff", "HEAD", "--binary"], cwd=checkout,
+                                    capture_output=True, check=True)
+            digest.update(result.stdout)
+    return digest.hexdigest()
+
+
+def get_build_cache_path(root_dir, v8_dir, gn_args_str, target_os, target_cpu):
+    """Get the path of the build cache entry for this configuration.
+
+    Entries are keyed on the revision and local changes of V8 and its
+    dependencies, the full GN args and the target. Returns None if the
+    checkout state can't be keyed.
+    """
+    tree_state = get_tree_state(get_checkouts(root_dir, v8_dir))
+    if tree_state is None:
+        print("Warning: Not using the build cache")
+        return None
+
+    digest = hashlib.sha256()
+    for part in (tree_state, gn_args_str, target_os, target_cpu):
+        digest.update(part.encode())
+        digest.update(b"\0")
+
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache")
+    ext = ".tar.zst" if zstandard else ".tar.gz"
+    return os.path.join(cache_home, "v8-build", digest.hexdigest() + ext)
+
+
+def restore_build_cache(cache_path, out_path):
+    """Extract a build cache entry into the output directory."""
+    print(f"==> Restoring build from cache: {cache_path}")
+    # Use the safe extraction filter where available (Python 3.12+ and backports)
+    kwargs = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+    with open(cache_path, "rb") as f:
+        if cache_path.endswith(".zst"):
+            with zstandard.ZstdDecompressor().stream_reader(f) as reader:
+                with tarfile.open(fileobj=reader, mode="r|") as tar:
+                    tar.extractall(out_path, **kwargs)
+        else:
+            with tarfile.open(fileobj=f, mode="r:gz") as tar:
+                tar.extractall(out_path, **kwargs)
+
+
+def save_build_cache(cache_path, out_path, target_os, ar_cmd="ar"):
+    """Store the built libraries and args.gn in the build cache."""
+    print(f"==> Saving build to cache: {cache_path}")
+    names = ["args.gn"]
+    lib_names = get_lib_names(target_os)
+    for lib_name in lib_names:
+        lib_path = os.path.join(out_path, "obj", lib_name)
+        if not os.path.exists(lib_path):
+            continue
+        # Thin archives only reference object files, which aren't cached
+        if lib_name != lib_names[0]:
+            convert_thin_archive(lib_path, ar_cmd)
+        names.append(os.path.join("obj", lib_name))
+
+    # Write to a temporary file first so a partial entry is never used
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        if zstandard:
+            with zstandard.ZstdCompressor(level=3).stream_writer(f) as writer:
+                with tarfile.open(fileobj=writer, mode="w|") as tar:
+                    for name in names:
+                        tar.add(os.path.join(out_path, name), arcname=name)
+        else:
+            with tarfile.open(fileobj=f, mode="w:gz") as tar:
+                for name in names:
+                    tar.add(os.path.join(out_path, name), arcname=name)
+    os.replace(tmp_path, cache_path)
+
+
+def link_compile_commands(v8_dir, out_path):
+    """Symlink compile_commands.json into the V8 root so clangd finds it."""
+    src = os.path.join(out_path, "compile_commands.json")
+    dst = os.path.join(v8_dir, "compile_commands.json")
+    if not os.path.isfile(src):
+        return
+
+    # Don't clobber a compile_commands.json that isn't ours
+    if os.path.lexists(dst):
+        if not os.path.islink(dst):
+            print(f"==> Not replacing existing {dst}")
+            return
+        os.remove(dst)
+
+    try:
+        os.symlink(os.path.relpath(src, v8_dir), dst)
+        print(f"==> Linked {dst}")
+    except OSError as e:
+        # Creating symlinks may require extra privileges on Windows
+        print(f"Warning: Could not link {dst}: {e}")
+
+
+def install_v8(v8_dir, out_path, install_dir, target_os, ar_cmd="ar", link_mode=None):
     """Install V8 libraries and headers to the specified directory."""
     print(f"==> Installing V8 to {install_dir}...")
 
     os.makedirs(install_dir, exist_ok=True)
 
     obj_dir = os.path.join(out_path, "obj")
+    include_src = os.path.abspath(os.path.join(v8_dir, "include"))
+    include_dst = os.path.join(install_dir, "include")
 
-    # Copy the monolith library
-    if target_os == "win":
-        lib_name = "v8_monolith.lib"
+    # Hardlink headers when possible instead of copying them. Libraries are
+    # always copied since downstream consumers may modify them.
+    if link_mode is None:
+        same_fs = os.stat(include_src).st_dev == os.stat(install_dir).st_dev
+        link_mode = "hardlink" if same_fs else "copy"
+        # Some filesystems (SMB, some FUSE and 9p mounts) refuse hardlinks
+        # even on the same device, so fall back to copying unless the user
+        # asked for hardlinks explicitly
+        if link_mode == "hardlink":
+            def copy_header(src, dst):
+                try:
+                    os.link(src, dst)
+                except OSError:
+                    shutil.copyfile(src, dst)
+        else:
+            copy_header = shutil.copyfile
+    elif link_mode == "hardlink":
+        copy_header = os.link
+    elif link_mode == "symlink":
+        def copy_header(src, dst):
+            os.symlink(os.path.abspath(src), dst)
     else:
-        lib_name = "libv8_monolith.a"
-
-    lib_src = os.path.join(obj_dir, lib_name)
-    lib_dst = os.path.join(install_dir, lib_name)
-    print(f"    Copying {lib_name}")
-    shutil.copy2(lib_src, lib_dst)
-
-    # On Linux, also copy libbase and libplatform (after converting from thin archives)
-    if target_os == "linux":
-        for extra_lib in ["libv8_libbase.a", "libv8_libplatform.a"]:
-            lib_src = os.path.join(obj_dir, extra_lib)
-            if os.path.exists(lib_src):
-                convert_thin_archive(lib_src)
-                lib_dst = os.path.join(install_dir, extra_lib)
-                print(f"    Copying {extra_lib}")
-                shutil.copy2(lib_src, lib_dst)
-
-    # Copy include directory
-    include_src = os.path.join(v8_dir, "include")
-    include_dst = os.path.join(install_dir, "include")
-    print(f"    Copying include/")
-    if os.path.exists(include_dst):
-        shutil.rmtree(include_dst)
-    shutil.copytree(include_src, include_dst)
+        copy_header = shutil.copyfile
+
+    def copy_lib(lib_name, thin=False):
+        lib_src = os.path.join(obj_dir, lib_name)
+        if thin:
+            convert_thin_archive(lib_src, ar_cmd)
+        print(f"    Copying {lib_name}")
+        # copyfile uses in-kernel copies where available (copy_file_range,
+        # sendfile), which matters for the multi-GB monolith library
+        shutil.copyfile(lib_src, os.path.join(install_dir, lib_name))
+
+    def copy_include():
+        print(f"    Copying include/ ({link_mode})")
+        if os.path.exists(include_dst):
+            shutil.rmtree(include_dst)
+        shutil.copytree(include_src, include_dst, copy_function=copy_header)
+
+    # The copies are independent and IO-bound, so run them in parallel
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        # Copy the monolith library
+        lib_name, *extra_libs = get_lib_names(target_os)
+        futures = [executor.submit(copy_lib, lib_name)]
+
+        # On Linux, also copy libbase and libplatform (after converting from thin archives)
+        for extra_lib in extra_libs:
+            if os.path.exists(os.path.join(obj_dir, extra_lib)):
+                futures.append(executor.submit(copy_lib, extra_lib, thin=True))
+
+        # Copy include directory
+        futures.append(executor.submit(copy_include))
+
+        for future in futures:
+            future.result()
 
     # Copy args.gn so users can see the build configuration
     args_gn_src = os.path.join(out_path, "args.gn")
@@ -184,8 +593,7 @@ def main():
         sys.exit(1)
 
     # Add depot_tools to PATH and get command names
-    is_windows = platform.system() == "Windows"
-    if is_windows:
+    if _IS_WINDOWS:
         path_sep = ";"
         gn_cmd = os.path.join(depot_tools_dir, "gn.bat")
         ninja_cmd = os.path.join(depot_tools_dir, "ninja.bat")
@@ -196,12 +604,21 @@ def main():
     env_path = depot_tools_dir + path_sep + os.environ.get("PATH", "")
 
     target_os = get_target_os()
-    target_cpu = args.target_cpu or get_target_cpu()
+    host_cpu = get_target_cpu()
+    target_cpu = args.target_cpu or host_cpu
 
     # Debug builds not supported on Windows
     is_debug = args.debug and target_os != "win"
     if args.debug and target_os == "win":
         print("Warning: Debug builds not supported on Windows, using release")
+    if args.release_official and args.debug:
+        print("Error: --release-official cannot be combined with --debug")
+        sys.exit(1)
+    if args.release_official and args.install_dir:
+        # The install layout doesn't include Chromium's libc++ headers, which
+        # consumers of these builds need
+        print("Error: --release-official cannot be combined with --install")
+        sys.exit(1)
 
     build_type = "debug" if is_debug else "release"
     print(f"==> Building V8 for {target_os}-{target_cpu} ({build_type})...")
@@ -209,17 +626,15 @@ def main():
     out_dir = f"out.gn/{target_os}-{target_cpu}-{build_type}"
     out_path = os.path.join(v8_dir, out_dir)
 
-    # Download Chromium's clang
-    # This avoids Xcode SDK issues on macOS and ensures consistent toolchain
-    clang_base_path = download_clang(v8_dir, root_dir)
+    # Chromium's clang avoids Xcode SDK issues on macOS and ensures a
+    # consistent toolchain. Its location is known before it is downloaded, so
+    # the build cache can be checked first.
+    system_clang_version = None
+    if args.system_clang:
+        clang_base_path, system_clang_version = find_system_clang()
+    else:
+        clang_base_path = get_clang_base_path(root_dir)
     clang_base_path_abs = os.path.abspath(clang_base_path)
-    print(f"==> Using clang at: {clang_base_path_abs}")
-
-    # Verify clang binary exists
-    clang_bin = os.path.join(clang_base_path_abs, "bin", "clang")
-    if not os.path.isfile(clang_bin):
-        print(f"WARNING: Clang binary not found at {clang_bin}")
-        print("The clang download may have failed. Build may use system clang instead.")
 
     # Flag-dependent GN arguments (prepended to args.gn)
     gn_args_prefix = [
@@ -235,10 +650,28 @@ def main():
         "is_clang=true",
         "use_custom_libcxx=false",
     ]
+    if system_clang_version:
+        # Chromium's build locates the clang runtime libraries by version
+        gn_args_prefix.append(f'clang_version="{system_clang_version}"')
+    if is_debug:
+        # Build the torque code generator with optimizations even in debug
+        # builds. Its output is the same, it just runs faster during the build
+        gn_args_prefix.append("v8_enable_fast_torque=true")
+    if args.release_official:
+        # Whole-program optimized build. The archives contain LLVM bitcode and
+        # V8's API uses std types from Chromium's bundled libc++ (std::__Cr),
+        # so consumers built against the system C++ library can't link them.
+        gn_args_prefix.remove("use_custom_libcxx=false")
+        gn_args_prefix += [
+            "is_official_build=true",
+            "use_custom_libcxx=true",
+            "use_lld=true",
+            "use_thin_lto=true",
+            "chrome_pgo_phase=0",
+        ]
 
     # Platform-specific arguments
     if target_os == "linux":
-        host_cpu = get_target_cpu()
         is_cross_compile = target_cpu != host_cpu
         if is_cross_compile:
             print(f"==> Cross-compiling from {host_cpu} to {target_cpu}")
@@ -252,34 +685,77 @@ def main():
     # Combine prefix args with custom args
     gn_args_str = "\n".join(gn_args_prefix) + "\n" + custom_args
 
-    # Write args.gn to output directory (more robust than passing via command line)
-    os.makedirs(out_path, exist_ok=True)
-    out_args_gn = os.path.join(out_path, "args.gn")
-    with open(out_args_gn, "w") as f:
-        f.write(gn_args_str)
-    print(f"==> Wrote {out_args_gn}")
-
-    # Run gn gen
-    print("==> Running gn gen...")
-    run([gn_cmd, "gen", out_dir],
-        cwd=v8_dir, env={"PATH": env_path})
-
-    # Build with ninja
-    print("==> Building with ninja...")
-    run([ninja_cmd, "-C", out_dir, "v8_monolith"],
-        cwd=v8_dir, env={"PATH": env_path})
+    # Reuse a previous build of the same configuration if cached
+    cache_path = None
+    if args.build_cache:
+        cache_path = get_build_cache_path(root_dir, v8_dir, gn_args_str,
+                                          target_os, target_cpu)
+    cache_hit = cache_path is not None and os.path.isfile(cache_path)
+
+    if not cache_hit:
+        if not args.system_clang:
+            download_clang(v8_dir, root_dir)
+        print(f"==> Using clang at: {clang_base_path_abs}")
+
+        # Verify clang binary exists
+        clang_bin = os.path.join(clang_base_path_abs, "bin", _CLANG_EXE)
+        if not is_cached_file(clang_bin):
+            print(f"WARNING: Clang binary not found at {clang_bin}")
+            print("The clang download may have failed. Build may use system clang instead.")
+
+    # Prefer llvm-ar from the clang toolchain, which created the archives
+    llvm_ar = os.path.join(clang_base_path_abs, "bin", "llvm-ar")
+    ar_cmd = llvm_ar if is_cached_file(llvm_ar) else "ar"
+
+    if cache_hit:
+        os.makedirs(out_path, exist_ok=True)
+        restore_build_cache(cache_path, out_path)
+    else:
+        # Write args.gn to output directory (more robust than passing via command line).
+        # Leave it untouched if unchanged so ninja doesn't see a newer args.gn and
+        # rerun gn gen
+        os.makedirs(out_path, exist_ok=True)
+        out_args_gn = os.path.join(out_path, "args.gn")
+        old_args_str = None
+        if os.path.isfile(out_args_gn):
+            with open(out_args_gn, "r") as f:
+                old_args_str = f.read()
+        if old_args_str != gn_args_str:
+            with open(out_args_gn, "w") as f:
+                f.write(gn_args_str)
+            print(f"==> Wrote {out_args_gn}")
+        else:
+            print(f"==> {out_args_gn} is up to date")
+
+        # Run gn gen, exporting compile_commands.json for clangd and other tools
+        print("==> Running gn gen...")
+        run([gn_cmd, "gen", "--export-compile-commands", out_dir],
+            cwd=v8_dir, env={"PATH": env_path})
+        link_compile_commands(v8_dir, out_path)
+
+        # Build with ninja
+        jobs = args.jobs if args.jobs is not None else compute_jobs()
+        print(f"==> Building with ninja ({jobs} jobs)...")
+        ninja_args = [ninja_cmd, "-C", out_dir, "-j", str(jobs)]
+        if target_os == "linux":
+            # Don't start new jobs while the machine is already overloaded
+            ninja_args += ["-l", str(os.cpu_count() or 1)]
+        run(ninja_args + ["v8_monolith"],
+            cwd=v8_dir, env={"PATH": env_path})
+
+        if cache_path:
+            save_build_cache(cache_path, out_path, target_os, ar_cmd)
 
     print("==> Build complete!")
 
     # Show output
-    if target_os == "win":
-        lib_name = "v8_monolith.lib"
-    else:
-        lib_name = "libv8_monolith.a"
-
+    lib_name = get_lib_names(target_os)[0]
     lib_path = os.path.join(out_path, "obj", lib_name)
-    if os.path.exists(lib_path):
-        size = os.path.getsize(lib_path)
+    try:
+        size = os.stat(lib_path).st_size
+    except FileNotFoundError:
+        size = None
+    if size is not None:
         print(f"\nStatic library: {lib_path}")
         print(f"Size: {size / (1024*1024):.1f} MB")
     else:
@@ -291,7 +767,7 @@ def main():
     # Install if requested
     if args.install_dir:
         install_dir = os.path.abspath(args.install_dir)
-        install_v8(v8_dir, out_path, install_dir, target_os)
+        install_v8(v8_dir, out_path, install_dir, target_os, ar_cmd, args.link_mode)
 
 
 if __name__ == "__main__":
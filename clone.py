@@ -2,10 +2,51 @@
 """Clone V8 and its dependencies using depot_tools."""
 
 import argparse
+import hashlib
+import mmap
 import os
 import subprocess
 import sys
 import platform
+import shutil
+
+DEPOT_TOOLS_URL = "https://chromium.googlesource.com/chromium/tools/depot_tools.git"
+V8_URL = "https://chromium.googlesource.com/v8/v8.git"
+
+# gclient solution for V8 that skips dependencies and hooks the v8_monolith
+# build doesn't need: test data, and the clang and sysroot downloads that
+# build.py handles itself
+GCLIENT_CONFIG = f"""solutions = [
+  {{
+    "name": "v8",
+    "url": "{V8_URL}",
+    "deps_file": "DEPS",
+    "managed": False,
+    "custom_deps": {{
+      "v8/test/benchmarks/data": None,
+      "v8/test/mozilla/data": None,
+      "v8/test/test262/data": None,
+      "v8/test/wasm-js/data": None,
+      "v8/third_party/android_ndk": None,
+    }},
+    "custom_vars": {{
+      "checkout_google_benchmark": False,
+      "checkout_fuchsia_sdk": False,
+      "download_gcmole": False,
+      "download_jsfunfuzz": False,
+      "checkout_v8_builtins_pgo_profiles": False,
+      "check_v8_header_includes": False,
+    }},
+    "custom_hooks": [
+      {{"name": "clang"}},
+      {{"name": "sysroot_arm"}},
+      {{"name": "sysroot_arm64"}},
+      {{"name": "sysroot_x86"}},
+      {{"name": "sysroot_x64"}},
+    ],
+  }},
+]
+"""
 
 
 def parse_args():
@@ -14,23 +55,63 @@ def parse_args():
                         help="Clone into this directory instead of the script directory")
     parser.add_argument("--v8-version", required=True,
                         help="V8 version tag to clone (e.g., 14.0.365.10)")
+    parser.add_argument("--force-sync", action="store_true",
+                        help="Run gclient sync even if dependencies are already synced")
     return parser.parse_args()
 
 
+# Host platform, queried once
+_IS_WINDOWS = platform.system() == "Windows"
+
 # On Windows, use locally installed Visual Studio instead of downloading
-if platform.system() == "Windows":
+if _IS_WINDOWS:
     os.environ["DEPOT_TOOLS_WIN_TOOLCHAIN"] = "0"
 
 
-def run(cmd, cwd=None, env=None):
-    """Run a command and exit on failure."""
+def run(cmd, cwd=None, env=None, check=True):
+    """Run a command and exit on failure.
+
+    With check=False, return the exit code instead of exiting on failure.
+    """
     print(f"==> Running: {' '.join(cmd)}")
-    merged_env = os.environ.copy()
-    if env:
-        merged_env.update(env)
-    result = subprocess.run(cmd, cwd=cwd, env=merged_env)
-    if result.returncode != 0:
-        sys.exit(result.returncode)
+    # Only build a new environment when overriding variables; otherwise the
+    # child inherits ours as-is
+    merged_env = {**os.environ, **env} if env else None
+    # Flush so our output isn't reordered after the child's when piped
+    sys.stdout.flush()
+    proc = subprocess.Popen(cmd, cwd=cwd, env=merged_env)
+    returncode = proc.wait()
+    if returncode != 0 and check:
+        sys.exit(returncode)
+    return returncode
+
+
+def write_gclient_config(root_dir):
+    """Write the .gclient file describing the V8 checkout.
+
+    An existing .gclient that we didn't write (e.g. from `fetch v8`, or
+    edited by hand) is left alone.
+    """
+    gclient_file = os.path.join(root_dir, ".gclient")
+    if os.path.isfile(gclient_file):
+        with open(gclient_file, "r") as f:
+            if f.read() == GCLIENT_CONFIG:
+                return
+        print(f"Warning: {gclient_file} was not written by clone.py, leaving it unchanged")
+        return
+
+    with open(gclient_file, "w") as f:
+        f.write(GCLIENT_CONFIG)
+    print(f"==> Wrote {gclient_file}")
+
+
+def get_sync_stamp(root_dir, v8_dir):
+    """Get a stamp identifying the V8 revision and gclient config to sync."""
+    result = subprocess.run(["git", "rev-parse", "HEAD"], cwd=v8_dir,
+                            capture_output=True, text=True, check=True)
+    with open(os.path.join(root_dir, ".gclient"), "rb") as f:
+        config_hash = hashlib.sha256(f.read()).hexdigest()
+    return f"{result.stdout.strip()} {config_hash}"
 
 
 def patch_crel_flag(v8_dir):
@@ -43,22 +124,40 @@ def patch_crel_flag(v8_dir):
         print(f"Warning: {build_gn} not found, skipping crel patch")
         return
 
-    print("==> Removing --allow-experimental-crel flag from BUILD.gn...")
-    with open(build_gn, "r") as f:
-        content = f.read()
-
-    # Remove the line that adds the crel flag
-    patched = content.replace(
-        '      cflags += [ "-Wa,--crel,--allow-experimental-crel" ]\n', ""
-    )
+    # Skip if BUILD.gn hasn't changed since it was last patched. The sentinel
+    # lives in v8/.git so it doesn't show up as an untracked file in the
+    # checkout.
+    sentinel = os.path.join(v8_dir, ".git", "crel-patched")
+    st = os.stat(build_gn)
+    signature = f"{st.st_mtime_ns} {st.st_size}"
+    if os.path.isfile(sentinel):
+        with open(sentinel, "r") as f:
+            if f.read().strip() == signature:
+                print("==> crel flag already removed")
+                return
 
-    if patched != content:
-        with open(build_gn, "w") as f:
+    print("==> Removing --allow-experimental-crel flag from BUILD.gn...")
+    crel_line = b'cflags += [ "-Wa,--crel,--allow-experimental-crel" ]'
+    with open(build_gn, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            found = content.find(crel_line) != -1
+            if found:
+                # Remove each line that adds the crel flag, whatever its
+                # indentation and line ending
+                lines = content[:].splitlines(keepends=True)
+                patched = b"".join(line for line in lines if crel_line not in line)
+
+    if found:
+        with open(build_gn, "wb") as f:
             f.write(patched)
         print("==> Patched BUILD.gn to remove crel flag")
     else:
         print("==> crel flag not found or already removed")
 
+    st = os.stat(build_gn)
+    with open(sentinel, "w") as f:
+        f.write(f"{st.st_mtime_ns} {st.st_size}\n")
+
 
 def main():
     args = parse_args()
@@ -74,37 +173,68 @@ def main():
     # Clone depot_tools if not present
     if not os.path.exists(depot_tools_dir):
         print("==> Cloning depot_tools...")
-        run(["git", "clone",
-             "https://chromium.googlesource.com/chromium/tools/depot_tools.git",
-             depot_tools_dir])
+        # Only the latest revision is needed; fall back to a full clone if
+        # the shallow clone fails (e.g. with an old git)
+        if run(["git", "clone", "--depth=1", DEPOT_TOOLS_URL, depot_tools_dir],
+               check=False) != 0:
+            print("==> Shallow clone failed, retrying with full history...")
+            shutil.rmtree(depot_tools_dir, ignore_errors=True)
+            run(["git", "clone", DEPOT_TOOLS_URL, depot_tools_dir])
     else:
         print("==> depot_tools already exists, skipping clone")
 
     # Add depot_tools to PATH
-    is_windows = platform.system() == "Windows"
-    if is_windows:
+    if _IS_WINDOWS:
         path_sep = ";"
-        fetch_cmd = os.path.join(depot_tools_dir, "fetch.bat")
         gclient_cmd = os.path.join(depot_tools_dir, "gclient.bat")
     else:
         path_sep = ":"
-        fetch_cmd = "fetch"
         gclient_cmd = "gclient"
     env_path = depot_tools_dir + path_sep + os.environ.get("PATH", "")
 
-    # Fetch V8 if not present
+    # Clone V8 at the requested version if not present, without history. This
+    # is what `fetch v8` does, minus its initial sync of every dependency at HEAD
     v8_dir = os.path.join(root_dir, "v8")
     if not os.path.exists(v8_dir):
-        print(f"==> Fetching V8...")
-        run([fetch_cmd, "v8"], cwd=root_dir, env={"PATH": env_path})
+        print(f"==> Cloning V8...")
+        run(["git", "clone", "--depth=1", "--branch", args.v8_version, V8_URL, v8_dir])
+
+    # An existing (possibly shallow) clone may not have the tag yet
+    tag_ref = f"refs/tags/{args.v8_version}"
+    result = subprocess.run(["git", "rev-parse", "--quiet", "--verify", tag_ref],
+                            cwd=v8_dir, capture_output=True)
+    if result.returncode != 0:
+        print(f"==> Fetching V8 version {args.v8_version}...")
+        # Keep full clones (e.g. from an earlier `fetch v8`) full
+        result = subprocess.run(["git", "rev-parse", "--is-shallow-repository"],
+                                cwd=v8_dir, capture_output=True, text=True, check=True)
+        depth_args = ["--depth=1"] if result.stdout.strip() == "true" else []
+        run(["git", "fetch"] + depth_args + ["origin", f"{tag_ref}:{tag_ref}"], cwd=v8_dir)
 
     # Checkout specific version
     print(f"==> Checking out V8 version {args.v8_version}...")
     run(["git", "checkout", args.v8_version], cwd=v8_dir)
 
-    # Sync dependencies
-    print("==> Syncing dependencies...")
-    run([gclient_cmd, "sync", "-D"], cwd=v8_dir, env={"PATH": env_path})
+    # Sync dependencies (without their git history). The dependency tree is
+    # fully determined by the V8 revision and the .gclient, so skip the sync
+    # if both are unchanged since the last successful one. The stamp lives in
+    # v8/.git so it goes away with the checkout, and a missing build/config
+    # catches dependency trees that were removed by hand.
+    write_gclient_config(root_dir)
+    sync_stamp_path = os.path.join(v8_dir, ".git", "v8-sync-stamp")
+    sync_stamp = get_sync_stamp(root_dir, v8_dir)
+    previous_stamp = None
+    deps_present = os.path.isdir(os.path.join(v8_dir, "build", "config"))
+    if not args.force_sync and deps_present and os.path.isfile(sync_stamp_path):
+        with open(sync_stamp_path, "r") as f:
+            previous_stamp = f.read().strip()
+    if previous_stamp == sync_stamp:
+        print("==> Dependencies already synced, skipping gclient sync")
+    else:
+        print("==> Syncing dependencies...")
+        run([gclient_cmd, "sync", "-D", "--no-history"], cwd=v8_dir, env={"PATH": env_path})
+        with open(sync_stamp_path, "w") as f:
+            f.write(sync_stamp + "\n")
 
     # Patch BUILD.gn to remove crel flag that breaks older toolchains
     patch_crel_flag(v8_dir)